@@ -1,11 +1,13 @@
-from flask import Flask, render_template, jsonify
+import eventlet
+eventlet.monkey_patch()
+
+from flask import Flask, render_template
 from flask_socketio import SocketIO
-import threading
 import time
-from coin_scraper import CoinGeckoScraper
-import pandas as pd
-import plotly
-import json
+from collections import deque
+from coin_scraper import CoinGeckoScraper, CoinTick
+import numpy as np
+import orjson
 import os
 from dotenv import load_dotenv
 
@@ -15,39 +17,144 @@ load_dotenv()
 app = Flask(__name__)
 # Use environment variable for secret key
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
-socketio = SocketIO(app, cors_allowed_origins="*")
+
+
+class OrjsonSocketIOJSON:
+    """Drop-in `json` module for Socket.IO packets backed by orjson."""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
+
+socketio = SocketIO(
+    app,
+    async_mode='eventlet',
+    cors_allowed_origins="*",
+    json=OrjsonSocketIOJSON
+)
+
+class PriceRing:
+    """Fixed-capacity price history stored as parallel timestamp/price arrays."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.empty(capacity, dtype=np.float64)
+        self.prices = np.empty(capacity, dtype=np.float64)
+        self.head = 0
+
+    def __len__(self):
+        return min(self.head, self.capacity)
+
+    def append(self, timestamp, price):
+        """Overwrite the oldest sample once the ring is full."""
+        i = self.head % self.capacity
+        self.timestamps[i] = timestamp
+        self.prices[i] = price
+        self.head += 1
+
+    def _chronological(self, values, head):
+        if head <= self.capacity:
+            return values[:head]
+        i = head % self.capacity
+        return np.concatenate((values[i:], values[:i]))
+
+    def view(self):
+        """Return (timestamps, prices) arrays, oldest first."""
+        head = self.head
+        return self._chronological(self.timestamps, head), self._chronological(self.prices, head)
+
+    def to_records(self):
+        """Return the history as a list of {'timestamp', 'price'} dicts."""
+        timestamps, prices = self.view()
+        return [
+            {'timestamp': timestamp, 'price': price}
+            for timestamp, price in zip(timestamps.tolist(), prices.tolist())
+        ]
+
 
 # Global variables
 scraper = CoinGeckoScraper(update_interval=60)
-latest_data = {}
-price_history = {}
+HISTORY_LENGTH = 100
+# Only configured coins are tracked, so unexpected API keys can't grow state
+latest_data = {}  # coin -> CoinTick
+price_history = {coin: PriceRing(HISTORY_LENGTH) for coin in scraper.coins}
+# Seed the charts with the same time span the live history covers. Ranges
+# under a day come back at 5-minute granularity, so the preloaded part of the
+# chart has ~20 points spaced 5 minutes apart before the 1-minute live ticks.
+PRELOAD_SECONDS = HISTORY_LENGTH * 60
+# Deltas not yet delivered to clients; flushed as one batch per emit
+pending_updates = deque(maxlen=HISTORY_LENGTH)
+# Bumped whenever a coin's history changes, and once per tick under '*';
+# response_cache[key] = (version, body) holds bodies serialized for that version
+history_version = {}
+response_cache = {}
+
+def json_response(obj, option=None):
+    """Serialize `obj` with orjson into a JSON response."""
+    return app.response_class(orjson.dumps(obj, option=option), mimetype='application/json')
+
+def cached_json_response(key, version, build):
+    """Serve the body for `key`, calling `build` only when `version` has changed."""
+    cached = response_cache.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, build())
+        response_cache[key] = cached
+    return app.response_class(cached[1], mimetype='application/json')
+
+def preload_history():
+    """Seed price_history from CoinGecko so charts aren't empty after a restart."""
+    for coin, points in scraper.preload_history(PRELOAD_SECONDS).items():
+        if not points:
+            continue
+        ring = price_history[coin]
+        for timestamp, price in points[-HISTORY_LENGTH:]:
+            ring.append(timestamp, price)
+        history_version[coin] = history_version.get(coin, 0) + 1
+    history_version['*'] = history_version.get('*', 0) + 1
 
 def background_scraper():
-    """Run the scraper in the background and emit updates via WebSocket."""
+    """Run the scraper in the background and emit updates via WebSocket.
+
+    Only the per-tick delta is broadcast; clients keep their own copy of the
+    history (seeded from /api/history) and append to it.
+    """
+    try:
+        preload_history()
+    except Exception as e:
+        app.logger.error("Error preloading price history: %s", e)
+    
     while True:
         try:
             data = scraper.get_current_prices()
             if data:
-                latest_data.update(data)
-                # Update price history
-                for coin in data:
-                    if coin not in price_history:
-                        price_history[coin] = []
-                    price_history[coin].append({
-                        'timestamp': time.time(),
-                        'price': data[coin].get('usd', 0)
-                    })
-                    # Keep only last 100 data points
-                    price_history[coin] = price_history[coin][-100:]
-                
-                # Emit update via WebSocket
-                socketio.emit('price_update', {
-                    'latest_data': latest_data,
-                    'price_history': price_history
-                })
+                timestamp = time.time()
+                updates = {}
+                for coin in scraper.coins:
+                    if coin not in data:
+                        continue
+                    tick = CoinTick.from_api(timestamp, data[coin])
+                    latest_data[coin] = tick
+                    if tick.usd is not None:
+                        price_history[coin].append(timestamp, tick.usd)
+                        history_version[coin] = history_version.get(coin, 0) + 1
+                    updates[coin] = tick
+                history_version['*'] = history_version.get('*', 0) + 1
+                pending_updates.append({'updates': updates})
+
+            # Emit every delta accumulated since the last successful emit. A
+            # broadcast without callbacks is encoded once and the same frame is
+            # sent to every client, so this stays O(1) in connected clients.
+            if pending_updates:
+                socketio.emit('price_update_batch', list(pending_updates))
+                pending_updates.clear()
         except Exception as e:
-            app.logger.error(f"Error in background scraper: {str(e)}")
-        time.sleep(60)  # Update every minute
+            app.logger.error("Error in background scraper: %s", e)
+        socketio.sleep(60)  # Update every minute
 
 @app.route('/')
 def index():
@@ -57,39 +164,54 @@ def index():
 @app.route('/api/latest')
 def get_latest():
     """API endpoint to get latest price data."""
-    return jsonify(latest_data)
+    return cached_json_response('latest', history_version.get('*', 0),
+                                lambda: orjson.dumps(latest_data))
 
 @app.route('/api/history')
 def get_history():
     """API endpoint to get price history."""
-    return jsonify(price_history)
+    return cached_json_response('history', history_version.get('*', 0), lambda: orjson.dumps(
+        {coin: ring.to_records() for coin, ring in price_history.items()}
+    ))
+
+def build_chart(coin):
+    """Build the serialized Plotly figure for a coin's price history."""
+    timestamps, prices = price_history[coin].view()
+    fig = {
+        'data': [{
+            'x': timestamps,
+            'y': prices,
+            'type': 'scatter',
+            'name': coin
+        }],
+        'layout': {
+            'title': f'{coin.upper()} Price History',
+            'xaxis': {'title': 'Time'},
+            'yaxis': {'title': 'Price (USD)'}
+        }
+    }
+    return orjson.dumps(fig, option=orjson.OPT_SERIALIZE_NUMPY)
 
 @app.route('/api/chart/<coin>')
 def get_chart(coin):
     """Generate price chart for a specific coin."""
-    if coin in price_history:
-        df = pd.DataFrame(price_history[coin])
-        fig = {
-            'data': [{
-                'x': df['timestamp'],
-                'y': df['price'],
-                'type': 'scatter',
-                'name': coin
-            }],
-            'layout': {
-                'title': f'{coin.upper()} Price History',
-                'xaxis': {'title': 'Time'},
-                'yaxis': {'title': 'Price (USD)'}
-            }
-        }
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    return jsonify({'error': 'No data available'})
+    if len(price_history.get(coin, ())):
+        return cached_json_response(('chart', coin), history_version.get(coin, 0),
+                                    lambda: build_chart(coin))
+    return json_response({'error': 'No data available'})
+
+scraper_task = None
+
+def start_background_scraper():
+    """Start the scraper on the eventlet hub, at most once per process."""
+    global scraper_task
+    if scraper_task is None:
+        scraper_task = socketio.start_background_task(background_scraper)
+
+# Started at import so gunicorn's eventlet workers poll too, not just __main__
+start_background_scraper()
 
 if __name__ == '__main__':
-    # Start the background scraper thread
-    scraper_thread = threading.Thread(target=background_scraper, daemon=True)
-    scraper_thread.start()
-    
     # Get port from environment variable or use default
     port = int(os.getenv('PORT', 5000))
     
@@ -1,26 +1,163 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 from datetime import datetime
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import sys
 import csv
 import os
+import atexit
 import logging
+import threading
 from collections import deque
-import statistics
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from termcolor import colored
 import yaml
 
+def _as_float(value) -> Optional[float]:
+    """Return value as a float, or None if it isn't a number."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+@dataclass(slots=True)
+class CoinTick:
+    """Validated snapshot of one coin from a /simple/price response."""
+    ts: float
+    usd: Optional[float]
+    eur: Optional[float]
+    gbp: Optional[float]
+    change_24h: Optional[float]
+    vol_24h: Optional[float]
+    mcap: Optional[float]
+
+    @classmethod
+    def from_api(cls, ts: float, raw: Dict) -> "CoinTick":
+        """Build a tick from CoinGecko's per-coin dict, ignoring unknown keys."""
+        return cls(
+            ts=ts,
+            usd=_as_float(raw.get("usd")),
+            eur=_as_float(raw.get("eur")),
+            gbp=_as_float(raw.get("gbp")),
+            change_24h=_as_float(raw.get("usd_24h_change")),
+            vol_24h=_as_float(raw.get("usd_24h_vol")),
+            mcap=_as_float(raw.get("usd_market_cap"))
+        )
+
+
+class _TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests every `per` seconds.
+
+    At most `burst` requests (default `rate`) go out back-to-back before the
+    bucket starts spacing them at the refill rate.
+    """
+
+    def __init__(self, rate: int, per: float, burst: Optional[int] = None):
+        self.capacity = burst if burst is not None else rate
+        self.tokens = float(self.capacity)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.fill_rate)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+
+class StreamingRSI:
+    """Wilder-smoothed RSI updated in O(1) per price."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0
+        self.last_price: Optional[float] = None
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> Optional[float]:
+        """Feed a new price and return the current RSI."""
+        if self.last_price is None:
+            self.last_price = price
+            return None
+
+        delta = price - self.last_price
+        self.last_price = price
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+
+        # Seed with a simple average, then apply Wilder's recursion
+        self.count += 1
+        n = min(self.count, self.period)
+        self.avg_gain = (self.avg_gain * (n - 1) + gain) / n
+        self.avg_loss = (self.avg_loss * (n - 1) + loss) / n
+
+        if self.count < self.period:
+            return None
+        if self.avg_loss == 0:
+            self.value = 100
+        else:
+            rs = self.avg_gain / self.avg_loss
+            self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+
+class StreamingSMA:
+    """Simple moving average maintained with a running sum."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> Optional[float]:
+        """Feed a new price and return the current average."""
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(price)
+        self.total += price
+
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+CURRENCY_SYMBOLS = {"usd": "$", "eur": "€", "gbp": "£"}
+# termcolor templates built once instead of per coin per tick
+CHANGE_UP = colored("{:+.2f}%", "green")
+CHANGE_DOWN = colored("{:+.2f}%", "red")
+
+
 class CoinGeckoScraper:
     def __init__(self, update_interval: int = 60):
         self.base_url = "https://api.coingecko.com/api/v3"
         self.update_interval = update_interval
         self._setup_logging()
         self._load_config()
+        self._setup_session()
         
-        # Initialize price history for technical indicators
-        self.price_history = {coin: deque(maxlen=30) for coin in self.coins}
+        # Initialize streaming technical indicators
+        self.indicators = {
+            coin: {
+                "rsi": StreamingRSI(14),
+                "ma_7": StreamingSMA(7),
+                "ma_30": StreamingSMA(30)
+            }
+            for coin in self.coins
+        }
         
     def _setup_logging(self):
         """Setup logging configuration."""
@@ -34,6 +171,37 @@ class CoinGeckoScraper:
         )
         self.logger = logging.getLogger(__name__)
         
+    def _setup_session(self):
+        """Setup a pooled HTTP session so the TLS connection is reused across polls."""
+        retries = Retry(
+            total=3,
+            backoff_factor=1.0,
+            status_forcelist=[500, 502, 503, 504]
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retries)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        
+        # CoinGecko's free tier allows roughly 30 calls per minute but 429s on
+        # bursts, so only a few calls may go out before pacing kicks in
+        self.rate_limiter = _TokenBucket(rate=30, per=60, burst=5)
+        self.max_rate_limit_retries = 3
+        self._etag = None
+        self._last_prices = {}
+        
+    def _request(self, url: str, params: Dict, headers: Optional[Dict] = None) -> requests.Response:
+        """Rate-limited GET that honours Retry-After on 429 responses."""
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.rate_limiter.acquire()
+            response = self.session.get(url, params=params, headers=headers, timeout=(3.05, 10))
+            if response.status_code != 429 or attempt == self.max_rate_limit_retries:
+                return response
+            
+            retry_after = response.headers.get("Retry-After", "")
+            delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+            self.logger.warning("Rate limited by CoinGecko, retrying in %ss", delay)
+            time.sleep(delay)
+        
     def _load_config(self):
         """Load configuration from YAML file."""
         try:
@@ -43,10 +211,18 @@ class CoinGeckoScraper:
             self.logger.warning("Config file not found. Creating default config.")
             config = self._create_default_config()
             
-        self.coins = config['coins']
-        self.currencies = config['currencies']
+        self.coins = tuple(config['coins'])
+        self.currencies = tuple(config['currencies'])
         self.csv_file = config['csv_file']
         self.price_alerts = config['price_alerts']
+        
+        # Precompute values the polling loop would otherwise rebuild every tick
+        self._coin_ids_param = ",".join(self.coins)
+        self._currencies_param = ",".join(self.currencies)
+        self._price_alerts = {
+            coin: (alerts.get('low', float('-inf')), alerts.get('high', float('inf')))
+            for coin, alerts in self.price_alerts.items()
+        }
         self._setup_csv()
         
     def _create_default_config(self) -> Dict:
@@ -70,104 +246,136 @@ class CoinGeckoScraper:
         return config
         
     def _setup_csv(self):
-        """Setup CSV file with headers if it doesn't exist."""
-        if not os.path.exists(self.csv_file):
+        """Open the CSV file for appending, writing headers if it doesn't exist."""
+        is_new = not os.path.exists(self.csv_file)
+        self._csv_fh = open(self.csv_file, 'a', newline='', buffering=1 << 16)
+        self._csv_writer = csv.writer(self._csv_fh)
+        atexit.register(self._csv_fh.close)
+        if is_new:
             headers = [
                 "timestamp", "coin", "price_usd", "price_eur", "price_gbp",
                 "change_24h", "volume_24h", "market_cap", "rsi", "ma_7", "ma_30"
             ]
-            with open(self.csv_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(headers)
+            self._csv_writer.writerow(headers)
+            self._csv_fh.flush()
                 
-    def calculate_rsi(self, prices: List[float], period: int = 14) -> Optional[float]:
-        """Calculate RSI for a list of prices."""
-        if len(prices) < period + 1:
-            return None
-            
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        gains = [delta if delta > 0 else 0 for delta in deltas]
-        losses = [-delta if delta < 0 else 0 for delta in deltas]
-        
-        avg_gain = statistics.mean(gains[-period:])
-        avg_loss = statistics.mean(losses[-period:])
-        
-        if avg_loss == 0:
-            return 100
-            
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
-        
-    def calculate_moving_average(self, prices: List[float], period: int) -> Optional[float]:
-        """Calculate moving average for a list of prices."""
-        if len(prices) < period:
-            return None
-        return statistics.mean(prices[-period:])
-        
     def check_price_alerts(self, coin: str, price: float):
         """Check if price alerts should be triggered."""
-        if coin in self.price_alerts:
-            alerts = self.price_alerts[coin]
-            if price >= alerts.get('high', float('inf')):
-                self.logger.warning(f"ALERT: {coin} price ({price}) is above {alerts['high']}")
-            if price <= alerts.get('low', float('-inf')):
-                self.logger.warning(f"ALERT: {coin} price ({price}) is below {alerts['low']}")
+        alerts = self._price_alerts.get(coin)
+        if alerts is not None:
+            low, high = alerts
+            if price >= high:
+                self.logger.warning("ALERT: %s price (%s) is above %s", coin, price, high)
+            if price <= low:
+                self.logger.warning("ALERT: %s price (%s) is below %s", coin, price, low)
                 
     def get_current_prices(self) -> Dict:
         """Fetch current prices for tracked coins."""
         try:
-            # Implement rate limiting
-            time.sleep(1)  # Basic rate limiting
-            
-            coin_ids = ",".join(self.coins)
             url = f"{self.base_url}/simple/price"
             params = {
-                "ids": coin_ids,
-                "vs_currencies": ",".join(self.currencies),
+                "ids": self._coin_ids_param,
+                "vs_currencies": self._currencies_param,
                 "include_24hr_change": "true",
                 "include_24hr_vol": "true",
                 "include_market_cap": "true"
             }
             
-            response = requests.get(url, params=params)
+            # Revalidate with the previous ETag; 304 means nothing changed
+            headers = {"If-None-Match": self._etag} if self._etag else None
+            response = self._request(url, params, headers)
+            if response.status_code == 304:
+                return self._last_prices
             response.raise_for_status()
-            return response.json()
+            
+            self._etag = response.headers.get("ETag")
+            self._last_prices = response.json()
+            return self._last_prices
             
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"Error fetching prices: {e}")
+            self.logger.error("Error fetching prices: %s", e)
             return {}
 
-    def save_to_csv(self, data: Dict):
-        """Save price data to CSV file."""
+    def get_price_history(self, coin: str, start: float, end: float) -> List[Tuple[float, float]]:
+        """Fetch (timestamp, USD price) pairs for a coin between two UNIX times."""
+        try:
+            url = f"{self.base_url}/coins/{coin}/market_chart/range"
+            params = {
+                "vs_currency": "usd",
+                "from": int(start),
+                "to": int(end)
+            }
+            
+            response = self._request(url, params)
+            response.raise_for_status()
+            # CoinGecko returns [milliseconds, price] pairs
+            return [(ms / 1000, price) for ms, price in response.json().get("prices", [])]
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.error("Error fetching price history for %s: %s", coin, e)
+            return []
+
+    def preload_history(self, seconds: float) -> Dict[str, List[Tuple[float, float]]]:
+        """Fetch the last `seconds` of price history for every tracked coin in parallel."""
+        end = time.time()
+        start = end - seconds
+        # Requests go through the shared token bucket, which paces them to
+        # one every two seconds once the initial burst is spent
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            histories = executor.map(lambda coin: self.get_price_history(coin, start, end), self.coins)
+            return dict(zip(self.coins, histories))
+
+    def _compute_indicators(self, data: Dict) -> Dict[str, Tuple[Optional[float], Optional[float], Optional[float]]]:
+        """Feed the latest prices into the indicators and return (rsi, ma_7, ma_30) per coin."""
+        results = {}
+        for coin in self.coins:
+            if coin in data:
+                indicators = self.indicators[coin]
+                price = data[coin].get("usd")
+                if isinstance(price, (int, float)):
+                    for indicator in indicators.values():
+                        indicator.update(price)
+                    self.check_price_alerts(coin, price)
+                
+                results[coin] = (
+                    indicators["rsi"].value,
+                    indicators["ma_7"].value,
+                    indicators["ma_30"].value
+                )
+        return results
+
+    def _csv_row(self, timestamp: str, coin: str, coin_data: Dict,
+                 indicators: Tuple[Optional[float], Optional[float], Optional[float]]) -> List:
+        """Build a CSV row for a single coin."""
+        rsi, ma_7, ma_30 = indicators
+        
+        return [
+            timestamp,
+            coin,
+            coin_data.get("usd", "N/A"),
+            coin_data.get("eur", "N/A"),
+            coin_data.get("gbp", "N/A"),
+            coin_data.get("usd_24h_change", "N/A"),
+            coin_data.get("usd_24h_vol", "N/A"),
+            coin_data.get("usd_market_cap", "N/A"),
+            f"{rsi:.2f}" if rsi is not None else "N/A",
+            f"{ma_7:.2f}" if ma_7 is not None else "N/A",
+            f"{ma_30:.2f}" if ma_30 is not None else "N/A"
+        ]
+
+    def save_to_csv(self, data: Dict, indicators: Dict):
+        """Save price data and precomputed indicators to CSV file."""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        with open(self.csv_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            for coin in self.coins:
-                if coin in data:
-                    # Calculate technical indicators
-                    rsi = self.calculate_rsi(list(self.price_history[coin]))
-                    ma_7 = self.calculate_moving_average(list(self.price_history[coin]), 7)
-                    ma_30 = self.calculate_moving_average(list(self.price_history[coin]), 30)
-                    
-                    row = [
-                        timestamp,
-                        coin,
-                        data[coin].get("usd", "N/A"),
-                        data[coin].get("eur", "N/A"),
-                        data[coin].get("gbp", "N/A"),
-                        data[coin].get("usd_24h_change", "N/A"),
-                        data[coin].get("usd_24h_vol", "N/A"),
-                        data[coin].get("usd_market_cap", "N/A"),
-                        f"{rsi:.2f}" if rsi is not None else "N/A",
-                        f"{ma_7:.2f}" if ma_7 is not None else "N/A",
-                        f"{ma_30:.2f}" if ma_30 is not None else "N/A"
-                    ]
-                    writer.writerow(row)
-
-    def display_prices(self, data: Dict):
-        """Display current prices in a formatted way."""
+        rows = [
+            self._csv_row(timestamp, coin, data[coin], indicators[coin])
+            for coin in self.coins if coin in data
+        ]
+        self._csv_writer.writerows(rows)
+        self._csv_fh.flush()
+
+    def display_prices(self, data: Dict, indicators: Dict):
+        """Display current prices and precomputed indicators in a formatted way."""
         print("\n" + "="*120)
         print(f"Coin Prices - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("="*120)
@@ -177,39 +385,21 @@ class CoinGeckoScraper:
         
         for coin in self.coins:
             if coin in data:
-                # Get prices in different currencies
-                prices = {
-                    "usd": data[coin].get("usd", "N/A"),
-                    "eur": data[coin].get("eur", "N/A"),
-                    "gbp": data[coin].get("gbp", "N/A")
-                }
-                
-                # Update price history for technical indicators
-                if isinstance(prices["usd"], (int, float)):
-                    self.price_history[coin].append(prices["usd"])
-                    self.check_price_alerts(coin, prices["usd"])
+                coin_data = data[coin]
+                rsi, ma_7, ma_30 = indicators[coin]
                 
-                # Calculate technical indicators
-                rsi = self.calculate_rsi(list(self.price_history[coin]))
-                ma_7 = self.calculate_moving_average(list(self.price_history[coin]), 7)
-                ma_30 = self.calculate_moving_average(list(self.price_history[coin]), 30)
-                
-                # Format prices
+                # Format prices, using None for missing values
                 formatted_prices = {}
-                for currency, price in prices.items():
-                    if isinstance(price, (int, float)):
-                        formatted_prices[currency] = f"${price:,.2f}" if currency == "usd" else f"€{price:,.2f}" if currency == "eur" else f"£{price:,.2f}"
-                    else:
-                        formatted_prices[currency] = "N/A"
-                
-                # Get other metrics
-                change = data[coin].get("usd_24h_change", "N/A")
+                for currency, symbol in CURRENCY_SYMBOLS.items():
+                    price = coin_data.get(currency)
+                    formatted_prices[currency] = f"{symbol}{price:,.2f}" if price is not None else "N/A"
                 
                 # Format other metrics
-                if isinstance(change, (int, float)):
-                    change = f"{change:+.2f}%"
-                    change_color = 'green' if change.startswith('+') else 'red'
-                    change = colored(change, change_color)
+                change = coin_data.get("usd_24h_change")
+                if change is None:
+                    change = "N/A"
+                else:
+                    change = (CHANGE_UP if change >= 0 else CHANGE_DOWN).format(change)
                 
                 # Format technical indicators
                 rsi_str = f"{rsi:.2f}" if rsi is not None else "N/A"
@@ -230,18 +420,26 @@ class CoinGeckoScraper:
         print(f"Data will be saved to {self.csv_file}")
         print("Price alerts are active for configured coins")
         
+        # Single CSV writer thread so disk writes overlap with printing
+        csv_executor = ThreadPoolExecutor(max_workers=1)
         try:
             while True:
+                started = time.monotonic()
                 data = self.get_current_prices()
                 if data:
-                    self.display_prices(data)
-                    self.save_to_csv(data)
-                time.sleep(self.update_interval)
+                    indicators = self._compute_indicators(data)
+                    csv_write = csv_executor.submit(self.save_to_csv, data, indicators)
+                    self.display_prices(data, indicators)
+                    csv_write.result()
+                # Keep a steady cadence regardless of how long the cycle took
+                time.sleep(max(0, self.update_interval - (time.monotonic() - started)))
                 
         except KeyboardInterrupt:
             self.logger.info("Stopping scraper...")
             print("\nStopping scraper...")
             sys.exit(0)
+        finally:
+            csv_executor.shutdown(wait=True)
 
 if __name__ == "__main__":
     # You can change the update interval here (in seconds)
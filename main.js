@@ -3,7 +3,9 @@ const socket = io();
 
 // Global variables
 let selectedCoin = 'bitcoin';
+let latestData = {};
 let priceHistory = {};
+const HISTORY_LENGTH = 100;
 
 // Format number with commas and decimals
 function formatNumber(num, decimals = 2) {
@@ -35,7 +37,7 @@ function updatePriceTable(data) {
         row.innerHTML = `
             <td>${coin.charAt(0).toUpperCase() + coin.slice(1)}</td>
             <td>${formatPrice(info.usd)}</td>
-            <td>${formatChange(info.usd_24h_change)}</td>
+            <td>${formatChange(info.change_24h)}</td>
             <td>${formatNumber(info.rsi || 0)}</td>
             <td>${formatPrice(info.ma_7 || 0)}</td>
             <td>${formatPrice(info.ma_30 || 0)}</td>
@@ -105,28 +107,70 @@ function selectCoin(coin) {
     updatePriceChart(coin, priceHistory);
 }
 
-// Handle WebSocket events
+// Append a point unless the history already covers its timestamp
+function appendPoint(history, point) {
+    const last = history[history.length - 1];
+    if (last && point.timestamp <= last.timestamp) return;
+    history.push(point);
+    if (history.length > HISTORY_LENGTH) {
+        history.splice(0, history.length - HISTORY_LENGTH);
+    }
+}
+
+// Merge a server snapshot with deltas that arrived while it was in flight
+function mergeLatest(snapshot) {
+    Object.entries(snapshot).forEach(([coin, info]) => {
+        const current = latestData[coin];
+        if (!current || current.ts < info.ts) {
+            latestData[coin] = info;
+        }
+    });
+}
+
+function mergeHistory(snapshot) {
+    Object.entries(snapshot).forEach(([coin, points]) => {
+        const local = priceHistory[coin] || [];
+        const merged = points.slice();
+        local.forEach(point => appendPoint(merged, point));
+        priceHistory[coin] = merged;
+    });
+}
+
+// Fetch the full state; deltas only cover ticks received while connected
+function resync() {
+    fetch('/api/latest')
+        .then(response => response.json())
+        .then(data => {
+            mergeLatest(data);
+            updatePriceTable(latestData);
+            updateAlerts(latestData);
+        });
+
+    fetch('/api/history')
+        .then(response => response.json())
+        .then(data => {
+            mergeHistory(data);
+            updatePriceChart(selectedCoin, priceHistory);
+        });
+}
+
+// Handle WebSocket events; 'connect' also fires after every reconnect
 socket.on('connect', () => {
     console.log('Connected to server');
+    resync();
 });
 
-socket.on('price_update', (data) => {
-    priceHistory = data.price_history;
-    updatePriceTable(data.latest_data);
+socket.on('price_update_batch', (batch) => {
+    batch.forEach(({ updates }) => {
+        Object.entries(updates).forEach(([coin, info]) => {
+            latestData[coin] = info;
+            const history = priceHistory[coin] || (priceHistory[coin] = []);
+            if (info.usd !== null) {
+                appendPoint(history, { timestamp: info.ts, price: info.usd });
+            }
+        });
+    });
+    updatePriceTable(latestData);
     updatePriceChart(selectedCoin, priceHistory);
-    updateAlerts(data.latest_data);
+    updateAlerts(latestData);
 });
-
-// Initial data load
-fetch('/api/latest')
-    .then(response => response.json())
-    .then(data => {
-        updatePriceTable(data);
-    });
-
-fetch('/api/history')
-    .then(response => response.json())
-    .then(data => {
-        priceHistory = data;
-        updatePriceChart(selectedCoin, priceHistory);
-    }); 
\ No newline at end of file